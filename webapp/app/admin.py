@@ -1,6 +1,113 @@
+import sys
+
 from django.contrib import admin
-from .models import RoommateProfile
+from django.core.paginator import Paginator
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from .models import RoommateProfile, MatchInteraction
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator that avoids an exact COUNT(*) on large, unfiltered changelists.
+    Filtered or small querysets still get an exact count.
+    """
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.has_filters():
+            return super().count
+
+        estimate = self._estimate_rows(self.object_list)
+        if estimate is None or estimate < self.exact_count_threshold:
+            return super().count
+        return estimate
+
+    @staticmethod
+    def _estimate_rows(queryset):
+        table = queryset.model._meta.db_table
+        connection = connections[queryset.db]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            elif connection.vendor == 'sqlite':
+                # MAX(rowid) is an index lookup; it over-counts only by deleted rows
+                cursor.execute(f'SELECT MAX(rowid) FROM "{table}"')
+            else:
+                return None
+            row = cursor.fetchone()
+        if not row or row[0] is None or row[0] < 0:
+            return None
+        return int(row[0])
+
+
+def username_prefix_ids(term):
+    """
+    Ids of users whose username starts with `term` (case-sensitive), written
+    as a range so the unique index on username can serve it.
+    """
+    if ord(term[-1]) == sys.maxunicode:
+        # No character sorts after the last one, so there is no upper bound
+        return User.objects.filter(username__startswith=term).values('pk')
+    upper = term[:-1] + chr(ord(term[-1]) + 1)
+    return User.objects.filter(username__gte=term, username__lt=upper).values('pk')
+
+
+@admin.register(RoommateProfile)
+class RoommateProfileAdmin(admin.ModelAdmin):
+    list_display = ('user', 'phone_number', 'sleep_schedule', 'study_habit', 'cleanliness_level', 'noise_tolerance')
+    list_select_related = ('user',)
+    list_filter = ('sleep_schedule', 'study_habit', 'cleanliness_level', 'noise_tolerance')
+    search_fields = ('user__username', 'phone_number')
+    search_help_text = "Exact phone number or username prefix (case-sensitive)."
+    raw_id_fields = ('user',)
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    actions = ['clear_phone_numbers']
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.isdigit():
+            return queryset.filter(phone_number=search_term), False
+        return queryset.filter(user_id__in=username_prefix_ids(search_term)), False
+
+    @admin.action(description="Clear phone number of selected profiles")
+    def clear_phone_numbers(self, request, queryset):
+        updated = queryset.update(phone_number=None)
+        self.message_user(request, f"Cleared phone number on {updated} profile(s).")
+
+
+@admin.register(MatchInteraction)
+class MatchInteractionAdmin(admin.ModelAdmin):
+    list_display = ('viewer', 'target', 'match_score', 'whatsapp_clicked', 'timestamp')
+    list_select_related = ('viewer', 'target')
+    list_filter = ('whatsapp_clicked',)
+    search_fields = ('viewer__username', 'target__username')
+    search_help_text = "Viewer or target username prefix (case-sensitive)."
+    raw_id_fields = ('viewer', 'target')
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    actions = ['mark_whatsapp_clicked', 'reset_whatsapp_clicked']
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        user_ids = username_prefix_ids(search_term)
+        return queryset.filter(Q(viewer_id__in=user_ids) | Q(target_id__in=user_ids)), False
 
+    @admin.action(description="Mark selected interactions as WhatsApp clicked")
+    def mark_whatsapp_clicked(self, request, queryset):
+        updated = queryset.update(whatsapp_clicked=True)
+        self.message_user(request, f"Marked {updated} interaction(s) as clicked.")
 
-# Register your models here.
-admin.site.register(RoommateProfile)
+    @admin.action(description="Reset WhatsApp click on selected interactions")
+    def reset_whatsapp_clicked(self, request, queryset):
+        updated = queryset.update(whatsapp_clicked=False)
+        self.message_user(request, f"Reset {updated} interaction(s).")
@@ -0,0 +1,337 @@
+"""
+End-to-end load test of the signup funnel against a running server.
+
+Each virtual user walks register -> activation link -> quiz -> dashboard ->
+WhatsApp click. Activation emails are captured by a local SMTP sink, so the
+server under test must be started with its email pointed at it. Run it on a
+scratch database so the lt_* users never reach real users' matches:
+
+    export DJANGO_DB_PATH=/tmp/loadtest.sqlite3
+    python manage.py migrate
+    EMAIL_HOST=127.0.0.1 EMAIL_PORT=1025 EMAIL_USE_TLS=False python manage.py runserver
+    python manage.py loadtest --users 200 --concurrency 20 --cleanup
+
+--cleanup deletes the run's users afterwards; it only works when this command
+sees the same database as the server.
+
+Redirects are never followed: each step checks the Location it gets back,
+and the page it points to is requested as the next step. SQLite lock errors
+are recognised from the 503 the server's 500 handler returns for them (or
+from the traceback page when the server runs with DEBUG on).
+"""
+import email
+import math
+import http.cookiejar
+import random
+import re
+import socketserver
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+
+STEPS = ['register', 'activate', 'quiz', 'dashboard', 'whatsapp']
+
+CSRF_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+ACTIVATE_RE = re.compile(r'(/activate/[^/\s]+/[^/\s]+/)')
+CONNECT_RE = re.compile(r'href="(/connect/\d+/)"')
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for Django's backend and keeps the activation links."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        recipients = []
+        self.reply('220 loadtest sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb == 'EHLO':
+                self.reply('250-loadtest')
+                self.reply('250 AUTH PLAIN')
+            elif verb == 'HELO':
+                self.reply('250 loadtest')
+            elif verb == 'AUTH':
+                self.reply('235 Authentication successful')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip().strip('<>').lower())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                self.server.deliver(recipients, self.read_data())
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                # MAIL, RSET, NOOP and anything else we don't care about
+                self.reply('250 OK')
+
+    def read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                break
+            if line.startswith(b'..'):
+                line = line[1:]
+            lines.append(line)
+        return b''.join(lines)
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, SMTPSinkHandler)
+        self.links = {}
+        self.received = threading.Condition()
+
+    def deliver(self, recipients, data):
+        message = email.message_from_bytes(data)
+        parts = message.walk() if message.is_multipart() else [message]
+        body = ''.join(
+            (part.get_payload(decode=True) or b'').decode(errors='replace')
+            for part in parts if not part.is_multipart()
+        )
+        found = ACTIVATE_RE.search(body)
+        if not found:
+            return
+        with self.received:
+            for rcpt in recipients:
+                self.links[rcpt] = found.group(1)
+            self.received.notify_all()
+
+    def wait_for_link(self, address, timeout):
+        address = address.lower()
+        with self.received:
+            self.received.wait_for(lambda: address in self.links, timeout=timeout)
+            return self.links.pop(address, None)
+
+
+class NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Hands 3xx responses back to the caller so each hop is timed on its own."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class StepError(Exception):
+    def __init__(self, message, sqlite_locked=False):
+        super().__init__(message)
+        self.sqlite_locked = sqlite_locked
+
+
+class VirtualUser:
+    def __init__(self, base_url, sink, run_id, index, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.sink = sink
+        self.timeout = timeout
+        self.username = f"lt_{run_id}_{index}"
+        self.email = f"{self.username}@loadtest.local"
+        self.phone = f"03{random.randrange(10 ** 9):09d}"
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            NoRedirectHandler(),
+        )
+        self.timings = {}
+
+    def request(self, path, data=None):
+        """Returns (location, page): the redirect target for a 3xx, else the body."""
+        url = path if path.startswith('http') else self.base_url + path
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(url, body, timeout=self.timeout) as response:
+                return None, response.read().decode(errors='replace')
+        except urllib.error.HTTPError as e:
+            if 300 <= e.code < 400:
+                return e.headers.get('Location', ''), ''
+            page = e.read().decode(errors='replace')
+            locked = e.code == 503 or 'database is locked' in page
+            raise StepError(f"HTTP {e.code} on {path}", sqlite_locked=locked)
+        except OSError as e:
+            raise StepError(f"{type(e).__name__} on {path}: {e}")
+
+    def expect_redirect(self, location, target, path):
+        if location is None:
+            raise StepError(f"{path} did not redirect, expected {target}")
+        if urllib.parse.urlsplit(location).path != target:
+            raise StepError(f"{path} redirected to {location!r}, expected {target}")
+
+    def post_form(self, path, fields):
+        _, page = self.request(path)
+        token = CSRF_RE.search(page)
+        if not token:
+            raise StepError(f"No CSRF token on {path}")
+        return self.request(path, dict(fields, csrfmiddlewaretoken=token.group(1)))
+
+    def timed(self, step, func):
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            self.timings[step] = time.perf_counter() - start
+
+    def register(self):
+        location, _ = self.post_form('/register/', {
+            'first_name': 'Load',
+            'username': self.username,
+            'email': self.email,
+            'password': 'loadtest-pass-123',
+        })
+        self.expect_redirect(location, '/', '/register/')
+
+    def activate(self):
+        link = self.sink.wait_for_link(self.email, self.timeout)
+        if link is None:
+            raise StepError("Activation email not received")
+        location, _ = self.request(link)
+        self.expect_redirect(location, '/quiz/', link)
+
+    def quiz(self):
+        location, _ = self.post_form('/quiz/', {
+            'phone_number': self.phone,
+            'sleep_schedule': random.choice(['Early', 'Late']),
+            'cleanliness_level': random.randint(1, 5),
+            'noise_tolerance': random.randint(1, 5),
+            'study_habit': random.choice(['Morning', 'Night', 'Mix']),
+        })
+        self.expect_redirect(location, '/dashboard/', '/quiz/')
+
+    def dashboard(self):
+        location, page = self.request('/dashboard/')
+        if location is not None:
+            raise StepError(f"/dashboard/ redirected to {location!r}")
+        return CONNECT_RE.findall(page)
+
+    def whatsapp(self, links):
+        if links:
+            link = random.choice(links)
+            location, _ = self.request(link)
+            if location is None or not location.startswith('https://wa.me/'):
+                raise StepError(f"{link} redirected to {location!r}, expected wa.me")
+
+    def run(self):
+        """Returns (timings, failed_step, error) for one pass through the funnel."""
+        step = None
+        try:
+            step = 'register'
+            self.timed(step, self.register)
+            step = 'activate'
+            self.timed(step, self.activate)
+            step = 'quiz'
+            self.timed(step, self.quiz)
+            step = 'dashboard'
+            links = self.timed(step, self.dashboard)
+            step = 'whatsapp'
+            self.timed(step, lambda: self.whatsapp(links))
+        except StepError as e:
+            return self.timings, step, e
+        return self.timings, None, None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = "Drives the register -> activate -> quiz -> dashboard -> WhatsApp funnel against a running server."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--users', type=int, default=50, help="Number of virtual users to push through the funnel.")
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--smtp-host', default='127.0.0.1')
+        parser.add_argument('--smtp-port', type=int, default=1025)
+        parser.add_argument('--timeout', type=float, default=30.0, help="Per-request and activation email timeout in seconds.")
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--cleanup', action='store_true',
+                            help="Delete the run's users afterwards (needs the server's database).")
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        run_id = uuid.uuid4().hex[:8]
+
+        sink = SMTPSink((options['smtp_host'], options['smtp_port']))
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+        self.stdout.write(
+            f"SMTP sink on {options['smtp_host']}:{options['smtp_port']}, "
+            f"{options['users']} users at concurrency {options['concurrency']} against {options['base_url']}"
+        )
+
+        def run_user(index):
+            return VirtualUser(options['base_url'], sink, run_id, index, options['timeout']).run()
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                results = list(pool.map(run_user, range(options['users'])))
+        finally:
+            sink.shutdown()
+            sink.server_close()
+        elapsed = time.perf_counter() - started
+
+        self.report(results, elapsed)
+
+        if options['cleanup']:
+            deleted, _ = User.objects.filter(username__startswith=f"lt_{run_id}_").delete()
+            self.stdout.write(f"Cleanup: deleted {deleted} rows for run {run_id}")
+
+    def report(self, results, elapsed):
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        locked = defaultdict(int)
+        completed = 0
+
+        for timings, failed_step, error in results:
+            for step, seconds in timings.items():
+                if step != failed_step:
+                    latencies[step].append(seconds)
+            if failed_step is None:
+                completed += 1
+            else:
+                errors[failed_step] += 1
+                if error.sqlite_locked:
+                    locked[failed_step] += 1
+
+        requests_made = sum(len(v) for v in latencies.values()) + sum(errors.values())
+        self.stdout.write(f"\nCompleted {completed}/{len(results)} funnels in {elapsed:.2f}s")
+        self.stdout.write(f"Throughput: {completed / elapsed:.2f} funnels/s, {requests_made / elapsed:.2f} steps/s\n")
+
+        self.stdout.write(f"{'step':<10} {'ok':>6} {'err':>5} {'locked':>7} {'err%':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for step in STEPS:
+            ok = latencies[step]
+            attempts = len(ok) + errors[step]
+            error_rate = (errors[step] / attempts * 100) if attempts else 0
+            self.stdout.write(
+                f"{step:<10} {len(ok):>6} {errors[step]:>5} {locked[step]:>7} {error_rate:>5.1f}% "
+                f"{percentile(ok, 50) * 1000:>8.1f} {percentile(ok, 90) * 1000:>8.1f} "
+                f"{percentile(ok, 99) * 1000:>8.1f} {max(ok, default=0) * 1000:>8.1f}"
+            )
+
+        for timings, failed_step, error in results:
+            if error is not None:
+                self.stdout.write(self.style.WARNING(f"First error at {failed_step}: {error}"))
+                break
@@ -0,0 +1,312 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Avg, Count, Q
+
+from .models import RankingScan, RoommateProfile
+
+
+TOP_K = 5
+
+
+def ranking_key(user_id):
+    return f"ranking:{user_id}"
+
+
+def score_match(my_profile, other):
+    """Heuristic compatibility score between two profiles, clamped to 0-100."""
+    score = 100
+    if my_profile.sleep_schedule != other.sleep_schedule: score -= 25
+    if my_profile.study_habit != other.study_habit: score -= 15
+    score -= (abs(my_profile.cleanliness_level - other.cleanliness_level) * 5)
+    score -= (abs(my_profile.noise_tolerance - other.noise_tolerance) * 5)
+    return max(score, 0)
+
+
+def build_match(other, score):
+    return {
+        'name': other.user.first_name or other.user.username,
+        'score': score,
+        'sleep': other.sleep_schedule,
+        'clean': other.cleanliness_level,
+        'phone': other.phone_number,
+        'profile': other,
+        'user_id': other.user.id
+    }
+
+
+def rank_key(entry):
+    """Sort key for cached (score, pk) entries; sort descending for best first."""
+    score, pk = entry
+    return score, -pk
+
+
+def rank_matches(my_profile, k=TOP_K, budget=None, record=True):
+    """
+    Scans the candidate pool in primary-key chunks, keeping a bounded heap of
+    the best k. If `budget` (seconds) runs out between chunks, the best-so-far
+    matches are returned and `partial` is True. `record` adds the scan to the
+    dashboard metrics; background recomputes pass False.
+
+    Returns (matches, partial).
+    """
+    started = time.monotonic()
+    deadline = started + budget if budget is not None else None
+    chunk_size = settings.MATCH_RANKING_CHUNK_SIZE
+
+    # Min-heap of (score, -pk, match): the root is the weakest of the top k,
+    # and among equal scores the higher pk is evicted first.
+    heap = []
+    first_result_at = None
+    partial = False
+    last_pk = 0
+
+    candidates = (RoommateProfile.objects
+                  .exclude(user_id=my_profile.user_id)
+                  .select_related('user')
+                  .order_by('pk'))
+
+    while True:
+        chunk = list(candidates.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+
+        for other in chunk:
+            entry = (score_match(my_profile, other), -other.pk, other)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+        last_pk = chunk[-1].pk
+
+        if first_result_at is None and heap:
+            first_result_at = time.monotonic()
+        if len(chunk) < chunk_size:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            partial = True
+            break
+
+    if record and first_result_at is not None:
+        record_metrics(first_result_at - started, partial)
+
+    ranked = sorted(heap, key=lambda entry: entry[:2], reverse=True)
+    return [build_match(other, score) for score, _, other in ranked], partial
+
+
+def to_entries(matches):
+    """What the cache holds for a ranking: (score, profile pk) pairs, best first."""
+    return [(match['score'], match['profile'].pk) for match in matches]
+
+
+def from_entries(my_profile, entries):
+    """
+    Rebuilds matches from cached entries using fresh rows from the database.
+    Returns None if any of the profiles has since been deleted.
+    """
+    profiles = RoommateProfile.objects.select_related('user').in_bulk([pk for _, pk in entries])
+    if len(profiles) != len(entries):
+        return None
+    matches = [build_match(profiles[pk], score_match(my_profile, profiles[pk])) for _, pk in entries]
+    matches.sort(key=lambda m: (m['score'], -m['profile'].pk), reverse=True)
+    return matches
+
+
+# Rankings live in the process-local cache, so the bookkeeping around them is
+# process-local too. _lock guards everything below and every read-modify-write
+# of a cached ranking.
+_lock = threading.Lock()
+# user_id -> Event for every background recompute in flight
+_in_flight = {}
+# user_id -> Event for the recomputes started by precompute_ranking; the
+# dashboard only ever waits on these
+_precomputing = {}
+# Viewers that currently have a cached ranking, oldest first
+_cached_viewers = OrderedDict()
+# Recently pushed profile pks as (sequence, pk), so a recompute that was
+# scanning while they were pushed can merge them in before it stores
+_pushes = deque(maxlen=256)
+_push_seq = 0
+
+
+# Background work runs on a few shared workers. At most
+# MATCH_RANKING_MAX_PENDING jobs are queued or running; beyond that new jobs
+# are dropped, so an overloaded database isn't handed even more full scans.
+_executor = ThreadPoolExecutor(max_workers=settings.MATCH_RANKING_WORKERS, thread_name_prefix='ranking')
+_pending = threading.BoundedSemaphore(settings.MATCH_RANKING_MAX_PENDING)
+
+
+def _in_background(func, *args):
+    """Queues `func(*args)` on the ranking workers. Returns False if it was dropped."""
+    if not _pending.acquire(blocking=False):
+        return False
+
+    def run():
+        try:
+            func(*args)
+        finally:
+            connection.close()
+            _pending.release()
+
+    _executor.submit(run)
+    return True
+
+
+def merge_entries(viewer, entries, profiles):
+    """Inserts or refreshes `profiles` in a viewer's entries, keeping the top k."""
+    pks = {profile.pk for profile in profiles}
+    merged = [entry for entry in entries if entry[1] not in pks]
+    merged += [(score_match(viewer, profile), profile.pk)
+               for profile in profiles if profile.user_id != viewer.user_id]
+    merged.sort(key=rank_key, reverse=True)
+    return merged[:TOP_K]
+
+
+def _store_ranking(user_id, entries):
+    """Caches a ranking and registers its viewer. Caller holds _lock."""
+    cache.set(ranking_key(user_id), entries, settings.MATCH_RANKING_CACHE_TIMEOUT)
+    _cached_viewers[user_id] = None
+    _cached_viewers.move_to_end(user_id)
+    while len(_cached_viewers) > settings.MATCH_RANKING_REGISTRY_SIZE:
+        evicted, _ = _cached_viewers.popitem(last=False)
+        # An unregistered ranking would miss pushes, so it can't stay cached
+        cache.delete(ranking_key(evicted))
+
+
+def take_ranking(user_id):
+    """Takes the cached entries for a user. A cached ranking is only ever read once."""
+    with _lock:
+        _cached_viewers.pop(user_id, None)
+        entries = cache.get(ranking_key(user_id))
+        cache.delete(ranking_key(user_id))
+    return entries
+
+
+def schedule_full_ranking(my_profile, precompute=False):
+    """
+    Recomputes the full ranking in a background thread and caches it until the
+    user's next dashboard view reads it. `precompute` marks a recompute the
+    dashboard may briefly wait on.
+    """
+    with _lock:
+        if my_profile.user_id in _in_flight:
+            return
+        done = _in_flight[my_profile.user_id] = threading.Event()
+        if precompute:
+            _precomputing[my_profile.user_id] = done
+        seen = _push_seq
+
+    def run():
+        nonlocal seen
+        try:
+            matches, _ = rank_matches(my_profile, record=False)
+            entries = to_entries(matches)
+            while True:
+                with _lock:
+                    missed = [pk for seq, pk in _pushes if seq > seen]
+                    if not missed:
+                        _store_ranking(my_profile.user_id, entries)
+                        break
+                    if _pushes[0][0] > seen + 1:
+                        # Too many pushes to catch up on; let the dashboard scan
+                        break
+                    seen = _push_seq
+                entries = merge_entries(my_profile, entries, RoommateProfile.objects.filter(pk__in=missed))
+        finally:
+            with _lock:
+                del _in_flight[my_profile.user_id]
+                _precomputing.pop(my_profile.user_id, None)
+            done.set()
+
+    if not _in_background(run):
+        with _lock:
+            del _in_flight[my_profile.user_id]
+            _precomputing.pop(my_profile.user_id, None)
+        done.set()
+
+
+def push_into_cached_rankings(profile):
+    """
+    Inserts (or refreshes) `profile` in every cached ranking where it now
+    belongs in the top k, so existing users see it without a rescan.
+    """
+    global _push_seq
+    with _lock:
+        _push_seq += 1
+        _pushes.append((_push_seq, profile.pk))
+        viewer_ids = [user_id for user_id in _cached_viewers if user_id != profile.user_id]
+    if not viewer_ids:
+        return
+
+    profile = RoommateProfile.objects.filter(pk=profile.pk).first()
+    if profile is None:
+        return
+    # Query before taking the lock; it's held only for the cache read-modify-write
+    viewers = list(RoommateProfile.objects.filter(user_id__in=viewer_ids))
+    with _lock:
+        for viewer in viewers:
+            key = ranking_key(viewer.user_id)
+            entries = cache.get(key)
+            if entries is None:
+                _cached_viewers.pop(viewer.user_id, None)
+                continue
+            merged = merge_entries(viewer, entries, [profile])
+            if merged != entries:
+                cache.set(key, merged, settings.MATCH_RANKING_CACHE_TIMEOUT)
+
+
+def precompute_ranking(profile):
+    """
+    Called when a profile is created or changed: ranks it in the background so
+    the next dashboard is ready, and pushes it into other users' cached rankings.
+    """
+    schedule_full_ranking(profile, precompute=True)
+    _in_background(push_into_cached_rankings, profile)
+
+
+def get_ranking(my_profile):
+    """
+    Returns (matches, partial) for the dashboard: the cached ranking if one is
+    ready (waiting briefly on a quiz-time precompute, never on a recompute
+    after a partial scan), otherwise a deadline-bounded scan. A partial scan
+    schedules a full recompute so the next visit gets complete results;
+    complete scans are not cached.
+    """
+    precomputing = _precomputing.get(my_profile.user_id)
+    if precomputing is not None:
+        precomputing.wait(settings.MATCH_RANKING_PREFETCH_WAIT)
+
+    entries = take_ranking(my_profile.user_id)
+    if entries is not None:
+        matches = from_entries(my_profile, entries)
+        if matches is not None:
+            return matches, False
+
+    matches, partial = rank_matches(my_profile, budget=settings.MATCH_RANKING_BUDGET)
+    if partial:
+        schedule_full_ranking(my_profile)
+    return matches, partial
+
+
+def record_metrics(time_to_first_result, partial):
+    RankingScan.objects.create(time_to_first_result=time_to_first_result * 1000, partial=partial)
+
+
+def ranking_metrics():
+    stats = RankingScan.objects.aggregate(
+        runs=Count('id'),
+        partial=Count('id', filter=Q(partial=True)),
+        avg_ttfr_ms=Avg('time_to_first_result'),
+    )
+    runs = stats['runs']
+    return {
+        'ranking_runs': runs,
+        'partial_rate': (stats['partial'] / runs * 100) if runs > 0 else 0,
+        'avg_ttfr_ms': stats['avg_ttfr_ms'] or 0,
+    }
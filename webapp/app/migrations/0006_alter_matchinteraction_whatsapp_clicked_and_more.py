@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:16
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_matchinteraction'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='matchinteraction',
+            name='whatsapp_clicked',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AlterField(
+            model_name='roommateprofile',
+            name='phone_number',
+            field=models.CharField(blank=True, db_index=True, max_length=11, null=True, validators=[django.core.validators.RegexValidator(message="Phone number must be entered in the format: '03001234567'", regex='^03\\d{9}$')]),
+        ),
+    ]
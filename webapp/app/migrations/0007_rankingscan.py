@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_alter_matchinteraction_whatsapp_clicked_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time_to_first_result', models.FloatField(help_text='Milliseconds until the first scored chunk')),
+                ('partial', models.BooleanField(default=False)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
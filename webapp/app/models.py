@@ -14,7 +14,8 @@ class RoommateProfile(models.Model):
         validators=[phone_regex],
         max_length=11,
         blank=True,
-        null=True
+        null=True,
+        db_index=True
     )
 
     SLEEP_CHOICES = [('Early', 'Early Bird'), ('Late', 'Night Owl')]
@@ -37,10 +38,19 @@ class MatchInteraction(models.Model):
     target = models.ForeignKey(User, related_name='target_interactions', on_delete=models.CASCADE)
     match_score = models.IntegerField()
     timestamp = models.DateTimeField(auto_now=True)
-    whatsapp_clicked = models.BooleanField(default=False)
+    whatsapp_clicked = models.BooleanField(default=False, db_index=True)
 
     class Meta:
         pass
 
     def __str__(self):
-        return f"{self.viewer} -> {self.target} ({self.match_score}%)"
\ No newline at end of file
+        return f"{self.viewer} -> {self.target} ({self.match_score}%)"
+
+class RankingScan(models.Model):
+    """One deadline-bounded ranking scan made for a dashboard request."""
+    time_to_first_result = models.FloatField(help_text="Milliseconds until the first scored chunk")
+    partial = models.BooleanField(default=False)
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.time_to_first_result:.1f}ms{' (partial)' if self.partial else ''}"
@@ -1,3 +1,380 @@
-from django.test import TestCase
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from . import matching
+from .admin import ApproximateCountPaginator, username_prefix_ids
+from .management.commands.loadtest import SMTPSink, percentile
+from .models import MatchInteraction, RoommateProfile
+
+
+logger = logging.getLogger(__name__)
+real_in_background = matching._in_background
+maxchar = chr(sys.maxunicode)
+
+
+def run_inline(func, *args):
+    func(*args)
+    return True
+
+
+class QueryFreeLock:
+    """Stands in for matching._lock and fails if a query runs while it is held."""
+
+    def __init__(self, test):
+        self.test = test
+
+    def __enter__(self):
+        self.queries = CaptureQueriesContext(connection)
+        self.queries.__enter__()
+
+    def __exit__(self, *exc_info):
+        self.queries.__exit__(*exc_info)
+        self.test.assertEqual(len(self.queries), 0, "query run while holding the ranking lock")
+
+
+def create_profile(username, **fields):
+    defaults = {'sleep_schedule': 'Early', 'cleanliness_level': 3, 'noise_tolerance': 3, 'study_habit': 'Mix'}
+    user = User.objects.create_user(username, first_name=username.title())
+    return RoommateProfile.objects.create(user=user, **dict(defaults, **fields))
+
+
+def load_production_settings():
+    with mock.patch.dict(os.environ, {'DJANGO_SECRET_KEY': 'test-only-secret', 'DJANGO_ALLOWED_HOSTS': 'testserver'}):
+        return importlib.import_module('webapp.settings_production')
+
+
+class DashboardResponseTests(TestCase):
+    """
+    Per-request render time and response bytes of the dashboard, dev vs
+    production settings. The test runner forces DEBUG off, so each run applies
+    its profile's DEBUG, middleware and template loaders explicitly.
+    """
+    requests = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', 'viewer@example.com', 'pass', first_name='Viewer')
+        RoommateProfile.objects.create(user=cls.user, sleep_schedule='Early', cleanliness_level=3,
+                                       noise_tolerance=3, study_habit='Mix')
+        for i in range(30):
+            other = User.objects.create_user(f'student{i}', first_name=f'Student {i}')
+            RoommateProfile.objects.create(user=other, phone_number=f'030000000{i:02d}',
+                                           sleep_schedule=['Early', 'Late'][i % 2],
+                                           cleanliness_level=i % 5 + 1, noise_tolerance=(i * 3) % 5 + 1,
+                                           study_habit=['Morning', 'Night', 'Mix'][i % 3])
+
+    def measure(self):
+        # A fresh client so the middleware chain is built from the active settings
+        self.client = self.client_class()
+        self.client.force_login(self.user)
+        cache.clear()
+        timings, sizes = [], []
+        for _ in range(self.requests):
+            start = time.perf_counter()
+            response = self.client.get('/dashboard/', HTTP_ACCEPT_ENCODING='gzip')
+            timings.append(time.perf_counter() - start)
+            self.assertEqual(response.status_code, 200)
+            sizes.append(len(response.content))
+        return response, sum(timings) / len(timings), sum(sizes) / len(sizes)
+
+    def test_dashboard_dev_vs_production(self):
+        production = load_production_settings()
+        # WhiteNoise needs a collected STATIC_ROOT and is not involved in rendering the dashboard
+        middleware = [m for m in production.MIDDLEWARE if 'whitenoise' not in m]
+
+        with override_settings(DEBUG=True):
+            dev_response, dev_time, dev_bytes = self.measure()
+        with override_settings(DEBUG=production.DEBUG, MIDDLEWARE=middleware, TEMPLATES=production.TEMPLATES):
+            prod_response, prod_time, prod_bytes = self.measure()
+
+        report = (f"dashboard dev: {dev_time * 1000:.2f} ms/request, {dev_bytes:.0f} bytes; "
+                  f"production: {prod_time * 1000:.2f} ms/request, {prod_bytes:.0f} bytes")
+        logger.info(report)
+
+        self.assertFalse(dev_response.has_header('Content-Encoding'), report)
+        self.assertEqual(prod_response['Content-Encoding'], 'gzip', report)
+        self.assertTrue(prod_response.has_header('ETag'), report)
+        self.assertLess(prod_bytes, dev_bytes / 2, report)
+
+
+@override_settings(MATCH_RANKING_CHUNK_SIZE=4)
+@mock.patch('app.matching._in_background', run_inline)
+class MatchRankingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.me = create_profile('me')
+        for i in range(12):
+            create_profile(f'student{i}', sleep_schedule=['Early', 'Late'][i % 2],
+                           cleanliness_level=(i * 2) % 5 + 1, noise_tolerance=(i * 3) % 5 + 1,
+                           study_habit=['Morning', 'Night', 'Mix'][i % 3])
+
+    def setUp(self):
+        cache.clear()
+
+    def expected(self, candidates):
+        """The unbounded sort dashboard_view used before the ranking engine."""
+        scored = [(matching.score_match(self.me, other), other.pk) for other in candidates]
+        scored.sort(key=lambda match: match[0], reverse=True)
+        return scored[:5]
+
+    def ranked(self, matches):
+        return [(match['score'], match['profile'].pk) for match in matches]
+
+    def test_full_scan_matches_unbounded_sort(self):
+        candidates = RoommateProfile.objects.exclude(pk=self.me.pk).order_by('pk')
+        matches, partial = matching.rank_matches(self.me)
+        self.assertFalse(partial)
+        self.assertEqual(self.ranked(matches), self.expected(candidates))
+
+    def test_zero_budget_returns_best_of_first_chunk(self):
+        first_chunk = RoommateProfile.objects.exclude(pk=self.me.pk).order_by('pk')[:4]
+        matches, partial = matching.rank_matches(self.me, budget=0)
+        self.assertTrue(partial)
+        self.assertEqual(self.ranked(matches), self.expected(first_chunk))
+
+    @override_settings(MATCH_RANKING_BUDGET=0)
+    def test_partial_dashboard_schedules_full_recompute(self):
+        self.client.force_login(self.me.user)
+
+        response = self.client.get('/dashboard/')
+        self.assertTrue(response.context['partial'])
+        self.assertIsNotNone(cache.get(matching.ranking_key(self.me.user_id)))
+
+        response = self.client.get('/dashboard/')
+        self.assertFalse(response.context['partial'])
+        full, _ = matching.rank_matches(self.me, record=False)
+        self.assertEqual(self.ranked(response.context['matches']), self.ranked(full))
+        # The recomputed ranking is served once, then the dashboard scans again
+        self.assertIsNone(cache.get(matching.ranking_key(self.me.user_id)))
+
+    def test_complete_scan_is_not_cached(self):
+        self.client.force_login(self.me.user)
+        response = self.client.get('/dashboard/')
+        self.assertFalse(response.context['partial'])
+        self.assertIsNone(cache.get(matching.ranking_key(self.me.user_id)))
+
+    @override_settings(MATCH_RANKING_BUDGET=0)
+    def test_deleted_match_in_cached_ranking_falls_back_to_scan(self):
+        self.client.force_login(self.me.user)
+        self.client.get('/dashboard/')
+        entries = cache.get(matching.ranking_key(self.me.user_id))
+        deleted = RoommateProfile.objects.get(pk=entries[0][1]).user
+        deleted.delete()
+
+        response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(deleted.pk, [match['user_id'] for match in response.context['matches']])
+        self.assertFalse(MatchInteraction.objects.filter(target_id=deleted.pk).exists())
+
+    def test_recompute_dropped_when_workers_are_saturated(self):
+        with mock.patch.object(matching, '_pending', threading.Semaphore(0)), \
+                mock.patch.object(matching, '_in_background', real_in_background):
+            matching.schedule_full_ranking(self.me)
+        self.assertNotIn(self.me.user_id, matching._in_flight)
+        self.assertIsNone(cache.get(matching.ranking_key(self.me.user_id)))
+
+    @override_settings(MATCH_RANKING_BUDGET=0)
+    def test_metrics_count_only_request_scans(self):
+        self.client.force_login(self.me.user)
+        self.client.get('/dashboard/')
+        self.client.get('/dashboard/')
+
+        metrics = matching.ranking_metrics()
+        self.assertEqual(metrics['ranking_runs'], 1)
+        self.assertEqual(metrics['partial_rate'], 100)
+
+
+@mock.patch('app.matching._in_background', run_inline)
+class PrecomputeRankingTests(TestCase):
+    quiz = {'sleep_schedule': 'Late', 'cleanliness_level': 1, 'noise_tolerance': 1, 'study_habit': 'Night'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.existing = create_profile('existing', sleep_schedule='Late', cleanliness_level=1,
+                                      noise_tolerance=1, study_habit='Night')
+        for i in range(8):
+            create_profile(f'student{i}', sleep_schedule='Late', cleanliness_level=3,
+                           noise_tolerance=1, study_habit='Night')
+
+    def setUp(self):
+        cache.clear()
+        matching._cached_viewers.clear()
+        matching._pushes.clear()
+
+    def submit_quiz(self, username):
+        user = User.objects.create_user(username, first_name=username.title())
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/quiz/', self.quiz)
+        self.assertRedirects(response, '/dashboard/', fetch_redirect_response=False)
+        return user
+
+    def cache_ranking_for(self, profile):
+        with override_settings(MATCH_RANKING_BUDGET=0, MATCH_RANKING_CHUNK_SIZE=2):
+            self.client.force_login(profile.user)
+            self.client.get('/dashboard/')
+        self.assertIsNotNone(cache.get(matching.ranking_key(profile.user_id)))
+
+    def test_quiz_precomputes_first_dashboard(self):
+        user = self.submit_quiz('newbie')
+        self.assertIsNotNone(cache.get(matching.ranking_key(user.pk)))
+
+        with mock.patch('app.matching.rank_matches') as rank_matches:
+            response = self.client.get('/dashboard/')
+        rank_matches.assert_not_called()
+        self.assertFalse(response.context['partial'])
+        self.assertEqual(response.context['matches'][0]['user_id'], self.existing.user_id)
+
+    def test_new_profile_pushed_into_cached_top_five(self):
+        self.cache_ranking_for(self.existing)
+        user = self.submit_quiz('newbie')
+
+        entries = cache.get(matching.ranking_key(self.existing.user_id))
+        self.assertEqual(entries[0], (100, user.roommateprofile.pk))
+        self.assertEqual(len(entries), 5)
+
+    def test_recompute_merges_profile_pushed_during_scan(self):
+        original = matching.rank_matches
+
+        def scan_then_signup(*args, **kwargs):
+            result = original(*args, **kwargs)
+            newbie = create_profile('newbie', **self.quiz)
+            matching.push_into_cached_rankings(newbie)
+            return result
+
+        with mock.patch('app.matching.rank_matches', scan_then_signup):
+            matching.schedule_full_ranking(self.existing)
+
+        newbie = RoommateProfile.objects.get(user__username='newbie')
+        self.assertEqual(cache.get(matching.ranking_key(self.existing.user_id))[0], (100, newbie.pk))
+
+    def test_push_runs_no_queries_under_lock(self):
+        self.cache_ranking_for(self.existing)
+        newbie = create_profile('newbie', **self.quiz)
+        with mock.patch.object(matching, '_lock', QueryFreeLock(self)):
+            matching.push_into_cached_rankings(newbie)
+        self.assertEqual(cache.get(matching.ranking_key(self.existing.user_id))[0], (100, newbie.pk))
+
+    def test_registry_fits_in_cache(self):
+        self.assertLess(settings.MATCH_RANKING_REGISTRY_SIZE, settings.CACHES['default']['OPTIONS']['MAX_ENTRIES'])
+
+    @override_settings(MATCH_RANKING_PREFETCH_WAIT=5)
+    def test_dashboard_does_not_wait_on_partial_recompute(self):
+        matching._in_flight[self.existing.user_id] = threading.Event()
+        try:
+            start = time.perf_counter()
+            matching.get_ranking(self.existing)
+            self.assertLess(time.perf_counter() - start, 1)
+        finally:
+            del matching._in_flight[self.existing.user_id]
+
+
+class AdminSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        cls.bob = create_profile('bob', phone_number='03001234567')
+        cls.bobby = create_profile('bobby')
+        cls.alice = create_profile('alice')
+        cls.edge = create_profile('bo' + maxchar)
+        MatchInteraction.objects.create(viewer=cls.bob.user, target=cls.alice.user, match_score=80)
+        MatchInteraction.objects.create(viewer=cls.alice.user, target=cls.bobby.user, match_score=70)
+        MatchInteraction.objects.create(viewer=cls.alice.user, target=cls.admin, match_score=60)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def usernames(self, ids):
+        return set(User.objects.filter(pk__in=ids).values_list('username', flat=True))
+
+    def search(self, url, term):
+        response = self.client.get(url, {'q': term})
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['cl'].result_list)
+
+    def test_username_prefix_is_case_sensitive(self):
+        self.assertEqual(self.usernames(username_prefix_ids('bob')), {'bob', 'bobby'})
+        self.assertEqual(self.usernames(username_prefix_ids('Bob')), set())
+
+    def test_username_prefix_ending_in_last_codepoint(self):
+        self.assertEqual(self.usernames(username_prefix_ids('bo' + maxchar)), {'bo' + maxchar})
+
+    def test_profile_search_by_phone_and_username(self):
+        url = '/admin/app/roommateprofile/'
+        self.assertEqual(self.search(url, '03001234567'), [self.bob])
+        self.assertEqual(set(self.search(url, 'bob')), {self.bob, self.bobby})
+        self.assertEqual(self.search(url, maxchar), [])
+
+    def test_interaction_search_matches_viewer_or_target(self):
+        results = self.search('/admin/app/matchinteraction/', 'bob')
+        self.assertEqual({(i.viewer.username, i.target.username) for i in results},
+                         {('bob', 'alice'), ('alice', 'bobby')})
+
+
+class ApproximateCountPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(6):
+            create_profile(f'student{i}')
+        # Deleted rows still count towards the MAX(rowid) estimate
+        RoommateProfile.objects.filter(user__username__in=['student0', 'student1']).delete()
+
+    def paginator(self, queryset, threshold):
+        paginator = ApproximateCountPaginator(queryset, 2)
+        paginator.exact_count_threshold = threshold
+        return paginator
+
+    def test_exact_count_below_threshold(self):
+        self.assertEqual(self.paginator(RoommateProfile.objects.all(), 100).count, 4)
+
+    def test_estimate_above_threshold(self):
+        self.assertEqual(self.paginator(RoommateProfile.objects.all(), 1).count,
+                         RoommateProfile.objects.order_by('-pk').first().pk)
+
+    def test_filtered_queryset_always_exact(self):
+        queryset = RoommateProfile.objects.filter(user__username='student5')
+        self.assertEqual(self.paginator(queryset, 1).count, 1)
+
+
+class LoadTestHelperTests(TestCase):
+
+    def test_percentile_nearest_rank(self):
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 50), 3)
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile(list(range(1, 101)), 90), 90)
+        self.assertEqual(percentile(list(range(1, 101)), 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_smtp_sink_captures_activation_link(self):
+        sink = SMTPSink(('127.0.0.1', 0))
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+        self.addCleanup(sink.server_close)
+        self.addCleanup(sink.shutdown)
+
+        connection = mail.get_connection('django.core.mail.backends.smtp.EmailBackend',
+                                         host='127.0.0.1', port=sink.server_address[1],
+                                         username='', password='', use_tls=False)
+        body = "Hi lt_run_0,\n\nhttp://testserver/activate/MTI/abc-123def/\n"
+        mail.EmailMessage("Activate", body, 'roomify@example.com', ['LT_Run_0@loadtest.local'],
+                          connection=connection).send()
+
+        self.assertEqual(sink.wait_for_link('lt_run_0@loadtest.local', 5), '/activate/MTI/abc-123def/')
+        # Each link is handed out once
+        self.assertIsNone(sink.wait_for_link('lt_run_0@loadtest.local', 0))
@@ -1,4 +1,5 @@
 import os
+import sys
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
@@ -12,7 +13,10 @@ from django.contrib import messages
 from .models import RoommateProfile, User, MatchInteraction
 from .forms import UserRegisterForm, QuizForm, EmailAuthenticationForm, UpdateForm
 from django.contrib.admin.views.decorators import staff_member_required
+from django.db import OperationalError, transaction
+from django.http import HttpResponse, HttpResponseServerError
 from django.db.models import Max, Avg
+from .matching import get_ranking, precompute_ranking, ranking_metrics
 
 
 def email_user(request, user):
@@ -102,6 +106,7 @@ def quiz_view(request):
             profile = form.save(commit=False)
             profile.user = request.user
             profile.save()
+            transaction.on_commit(lambda: precompute_ranking(profile))
             return redirect('dashboard')
     else:
         form = QuizForm()
@@ -117,7 +122,8 @@ def add_phone_number(request):
     if request.method == 'POST':
         form = UpdateForm(request.POST, instance=request.user.roommateprofile)
         if form.is_valid():
-            form.save()
+            profile = form.save()
+            transaction.on_commit(lambda: precompute_ranking(profile))
             messages.success(request, "Phone number updated! You are now visible to matches.")
             return redirect('dashboard')
         else:
@@ -138,29 +144,7 @@ def dashboard_view(request):
         missing_phone = True
         phone_form = UpdateForm(instance=my_profile)
 
-    all_profiles = RoommateProfile.objects.exclude(user=request.user)
-    matches = []
-
-    for other in all_profiles:
-        score = 100
-        if my_profile.sleep_schedule != other.sleep_schedule: score -= 25
-        if my_profile.study_habit != other.study_habit: score -= 15
-        score -= (abs(my_profile.cleanliness_level - other.cleanliness_level) * 5)
-        score -= (abs(my_profile.noise_tolerance - other.noise_tolerance) * 5)
-        final_score = max(score, 0)
-
-        matches.append({
-            'name': other.user.first_name or other.user.username,
-            'score': final_score,
-            'sleep': other.sleep_schedule,
-            'clean': other.cleanliness_level,
-            'phone': other.phone_number,
-            'profile': other,
-            'user_id': other.user.id
-        })
-
-    matches.sort(key=lambda x: x['score'], reverse=True)
-    top_matches = matches[:5]
+    top_matches, partial = get_ranking(my_profile)
 
     for match in top_matches:
         MatchInteraction.objects.update_or_create(
@@ -172,6 +156,7 @@ def dashboard_view(request):
 
     context = {
         'matches': top_matches,
+        'partial': partial,
         'missing_phone': missing_phone,
         'phone_form': phone_form
     }
@@ -233,6 +218,17 @@ def metrics_dashboard(request):
             'total_views': total_views,
             'total_users': total_users,
             'total_profiles': total_profiles,
+            **ranking_metrics(),
         }
 
-    return render(request, 'metrics.html', context)
\ No newline at end of file
+    return render(request, 'metrics.html', context)
+
+def server_error(request):
+    """
+    500 handler. SQLite "database is locked" errors get a 503 with Retry-After
+    so clients (and the load test) can tell them apart from real bugs.
+    """
+    exception = sys.exc_info()[1]
+    if isinstance(exception, OperationalError) and 'database is locked' in str(exception):
+        return HttpResponse("Server busy, please retry.", status=503, headers={'Retry-After': '1'})
+    return HttpResponseServerError("<h1>Server Error (500)</h1>")
@@ -85,7 +85,20 @@ WSGI_APPLICATION = "webapp.wsgi.application"
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": os.getenv('DJANGO_DB_PATH', BASE_DIR / "db.sqlite3"),
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {
+            "MAX_ENTRIES": 2000,
+        },
     }
 }
 
@@ -132,11 +145,28 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
+# Match ranking
+# Time budget (seconds) for the dashboard scan before partial results are served
+
+MATCH_RANKING_BUDGET = float(os.getenv('MATCH_RANKING_BUDGET', 0.5))
+MATCH_RANKING_CHUNK_SIZE = 500
+# Background recomputes share this many workers; jobs beyond MAX_PENDING are dropped
+MATCH_RANKING_WORKERS = 2
+MATCH_RANKING_MAX_PENDING = 8
+# How long a background recompute is kept for the user's next dashboard view
+MATCH_RANKING_CACHE_TIMEOUT = 300
+# How long a dashboard waits on a ranking precomputed at quiz submission
+MATCH_RANKING_PREFETCH_WAIT = 1.0
+# Most cached rankings kept per process; new profiles are pushed into each.
+# Kept well below the cache's MAX_ENTRIES so culling doesn't evict them first.
+MATCH_RANKING_REGISTRY_SIZE = 1000
+
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_HOST_USER = os.getenv('EMAIL_ADDRESS')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 DEFAULT_FROM_EMAIL = f'Roomify {os.getenv("EMAIL_ADDRESS")}'
 ACCOUNT_EMAIL_SUBJECT_PREFIX = ''
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+Production settings for webapp project.
+
+Builds on the development settings and reads deployment-specific values from
+the environment. Select it with:
+
+    DJANGO_SETTINGS_MODULE=webapp.settings_production
+
+Required environment variables: DJANGO_SECRET_KEY, DJANGO_ALLOWED_HOSTS.
+Set DJANGO_BEHIND_PROXY=True when a reverse proxy terminates HTTPS.
+Run `python manage.py collectstatic` before starting the server.
+
+For the deployment checklist, see
+https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, TEMPLATES
+
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+DEBUG = os.getenv('DJANGO_DEBUG', 'False') == 'True'
+
+ALLOWED_HOSTS = [host.strip() for host in os.environ['DJANGO_ALLOWED_HOSTS'].split(',') if host.strip()]
+
+CSRF_TRUSTED_ORIGINS = [origin.strip() for origin in os.getenv('DJANGO_CSRF_TRUSTED_ORIGINS', '').split(',') if origin.strip()]
+
+
+# GZip compresses HTML responses (CSRF tokens are masked per request, which
+# mitigates BREACH). ConditionalGet adds ETags and answers 304 Not Modified.
+# WhiteNoise serves the pre-compressed static files.
+
+MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "django.middleware.gzip.GZipMiddleware",
+    "django.middleware.http.ConditionalGetMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
+
+# Templates are parsed once per process and kept in memory
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        "APP_DIRS": False,
+        "OPTIONS": {
+            **TEMPLATES[0]["OPTIONS"],
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
+        },
+    },
+]
+
+
+# Database
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv('DJANGO_DB_PATH', BASE_DIR / "db.sqlite3"),
+    }
+}
+
+
+# Static files are content-hashed and stored with .gz/.br copies by collectstatic
+
+STATIC_ROOT = os.getenv('DJANGO_STATIC_ROOT', BASE_DIR / "staticfiles")
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
+
+# Security
+
+SESSION_COOKIE_SECURE = os.getenv('DJANGO_SECURE_COOKIES', 'True') == 'True'
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE
+# Only trust X-Forwarded-Proto behind a proxy that sets it and strips client copies
+if os.getenv('DJANGO_BEHIND_PROXY', 'False') == 'True':
+    SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -23,3 +23,5 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("app.urls"))
 ]
+
+handler500 = 'app.views.server_error'